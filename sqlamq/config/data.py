@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from typing import Any, List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional
 from dotenv import load_dotenv
+from sqlalchemy import Engine, event
 
 import os
 
@@ -33,6 +34,29 @@ class QueryParams:
     synchronize_session: Optional[str] = False
     updated_values: Optional[Dict[str, Any]] = None
     order_by: Optional[OrderByParams] = None
+    yield_per: Optional[int] = 1000
+    sync_lag: Optional[float] = 0
+    priority: Optional[str] = None
+    bulk_values: Optional[List[Dict[str, Any]]] = None
+    chunk_size: Optional[int] = 1000
+
+
+@dataclass
+class ShardParams:
+    engines: List[Any]
+    shard_key: Optional[Callable[[Any], int]] = None
+    key_columns: Optional[List[Any]] = None
+    max_workers: Optional[int] = None
+
+
+@dataclass
+class SQLiteParams:
+    journal_mode: Optional[str] = "WAL"
+    synchronous: Optional[str] = "NORMAL"
+    mmap_size: Optional[int] = 268435456
+    cache_size: Optional[int] = -65536
+    temp_store: Optional[str] = "MEMORY"
+    busy_timeout: Optional[int] = 5000
 
 
 def sqlalchemy_url_builder(
@@ -41,7 +65,8 @@ def sqlalchemy_url_builder(
         db_password=os.getenv("DB_PASSWORD"),
         db_table_name=os.getenv("DB_TABLE_NAME"),
         db_host=os.getenv("DB_HOST"),
-        db_port=os.getenv("DB_PORT")
+        db_port=os.getenv("DB_PORT"),
+        read_only: bool = False
 ) -> bool | str:
     """
     Function to generate sqlalchemy link to connect to the database later on.
@@ -55,6 +80,7 @@ def sqlalchemy_url_builder(
     :param db_table_name: Selection name of the database.
     :param db_host: Host of the database (localhost by default).
     :param db_port: Port of the database (5432 by default).
+    :param read_only: Open SQLite database in read-only mode, so that many readers can select concurrently.
 
     :return: Sqlalchemy path/status of successful link build.
     """
@@ -63,6 +89,8 @@ def sqlalchemy_url_builder(
     port = 5432
 
     if db_type == "sqlite":
+        if read_only:
+            return f"{db_type}:///file:./{db_table_name}.db?mode=ro&uri=true"
         return f"{db_type}:///./{db_table_name}.db"
 
     if db_type and db_name and db_password and db_table_name:
@@ -78,3 +106,49 @@ def sqlalchemy_url_builder(
             return f"{db_type}+mysqlconnector://{db_name}:{db_password}@{host}:{port}/{db_table_name}"
 
     return False
+
+
+def sqlite_performance_profile(engine: Engine, params: SQLiteParams = None) -> bool:
+    """
+    Function to apply SQLite performance pragmas to every new connection of the engine.
+
+    By default it enables WAL journal, memory-mapped reads, a 64 MiB page cache,
+    in-memory temporary storage, synchronous=NORMAL and a busy timeout.
+    Engines opened with mode=ro, see sqlalchemy_url_builder(read_only=True),
+    skip journal mode changes and are marked as query_only.
+
+    :param engine: Engine connected to the SQLite database.
+    :param params: Pragma values, None values are left at SQLite defaults.
+
+    :return: True if the profile was applied, False if engine is not SQLite.
+    """
+
+    if engine.dialect.name != "sqlite":
+        return False
+
+    params = params or SQLiteParams()
+
+    pragmas = {
+        "busy_timeout": params.busy_timeout,
+        "synchronous": params.synchronous,
+        "mmap_size": params.mmap_size,
+        "cache_size": params.cache_size,
+        "temp_store": params.temp_store,
+    }
+    if engine.url.query.get("mode") == "ro":
+        pragmas["query_only"] = "ON"
+    else:
+        # Journal mode is persistent and has to be set by a writer before readers open the file
+        pragmas = {"journal_mode": params.journal_mode, **pragmas}
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas.items():
+                if value is not None:
+                    cursor.execute(f"PRAGMA {pragma} = {value}")
+        finally:
+            cursor.close()
+
+    return True
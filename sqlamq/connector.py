@@ -1,16 +1,26 @@
+import hashlib
+import heapq
+import itertools
 import logging
 import random
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import betterlogging
 
-from sqlalchemy import create_engine, Engine, or_, and_, exists, Table, Select, select, update, delete, NullPool, text
-from sqlalchemy.exc import CompileError, SQLAlchemyError
+from sqlalchemy import create_engine, Engine, or_, and_, exists, Table, Select, select, update, delete, NullPool, text, \
+    bindparam, column, values
+from sqlalchemy.sql import func, operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList, UnaryExpression
+from sqlalchemy.exc import CompileError, IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session, DeclarativeBase, close_all_sessions
 
-from sqlamq.utils.sqla_api.models.models import User, Base, Post
-from typing import Any, Literal, Iterable, List
+from sqlamq.utils.sqla_api.models.models import User, Base, Post, Watermark
+from typing import Any, Literal, Iterable, Iterator, List, Optional
 
-from sqlamq.config.data import sqlalchemy_url_builder, QueryParams
+from sqlamq.config.data import sqlalchemy_url_builder, sqlite_performance_profile, QueryParams, ShardParams
+from sqlamq.utils.scheduler import QueryScheduler, scheduler_for
 
 
 def setup_logging() -> None:
@@ -36,31 +46,70 @@ def setup_logging() -> None:
     logger.info("Program started!")
 
 
+DEFAULT_PRIORITIES = {
+    "select": "interactive",
+    "update": "normal",
+    "delete": "normal",
+    "drop": "batch",
+    "sync": "batch",
+}
+
+
 class DatabaseMultifunctionalQuery:
     def __init__(
             self,
-            engine: Engine,
-            method: Literal["select", "update", "delete", "drop"],
+            engine: Engine | ShardParams,
+            method: Literal["select", "update", "delete", "drop", "sync"],
             selection: List[Any],
-            params: QueryParams = None
+            params: QueryParams = None,
+            scheduler: QueryScheduler = None
     ):
-        self.engine = engine
+        # A ShardParams instance switches the query into sharded mode
+        self.shards = engine if isinstance(engine, ShardParams) else None
+        self.engine = None if self.shards else engine
         self.method = method
         self.selection = selection
         self.params = params
+        self.scheduler = scheduler or scheduler_for(self.shards.engines if self.shards else [engine])
 
     def query(self) -> bool | Iterable[Any]:
+        """
+        Function to perform the query once it is admitted by the scheduler.
+
+        Priority is taken from params, otherwise selections are 'interactive',
+        updates and deletes are 'normal', drops and incremental selections are 'batch'.
+        Lazy results keep the scheduler slot until they are exhausted or closed.
+
+        :return: Result of the query or False if it was not admitted in time.
+        """
+
+        priority = self.params.priority if self.params and self.params.priority else \
+            DEFAULT_PRIORITIES.get(self.method, "normal")
+
+        # Lazy results of incremental and scattered selections hold the slot until they are consumed or closed
+        return self.scheduler.run(priority, self.__query)
+
+    def __query(self) -> bool | Iterable[Any]:
 
         # Check if the method is valid
-        if self.method not in ["select", "update", "delete", "drop"]:
-            logging.error("Invalid method. Please use 'select', 'update', or 'delete'.")
+        if self.method not in ["select", "update", "delete", "drop", "sync"]:
+            logging.error("Invalid method. Please use 'select', 'update', 'delete', 'drop' or 'sync'.")
             return False
 
+        # Incremental selection may go without filters to follow the whole table
+        if self.method == "sync" and not self.params:
+            self.params = QueryParams()
+
+        # Bulk update addresses rows by primary key instead of filters
+        bulk = self.method == "update" and self.params and self.params.bulk_values
+
         # Ensure that the parameters for the query are provided
-        if not self.params or (not self.params.filter and not self.params.join):
+        if self.method != "sync" and not bulk and (not self.params or (not self.params.filter and not self.params.join)):
             if self.method == "drop":
                 logging.info("Performing tables deletion...")
-                return self.__query_drop()
+                if self.shards:
+                    return all([self.__query_drop(engine=engine) for engine in self.shards.engines])
+                return self.__query_drop(engine=self.engine)
 
             logging.error("No parameters for database query were provided.")
             return False
@@ -97,29 +146,342 @@ class DatabaseMultifunctionalQuery:
         if self.params.order_by and self.params.order_by.expressions:
             stmt = stmt.order_by(*self.params.order_by.expressions)
 
-        # Call the appropriate query method based on the selected method
+        if self.shards:
+            return self.__query_sharded(stmt=stmt, synchronize_session=synchronize_session)
+
+        return self.__query_engine(engine=self.engine, stmt=stmt, synchronize_session=synchronize_session)
+
+    def __query_engine(self, engine: Engine, stmt: Select, synchronize_session) -> bool | Iterable[Any]:
+        """
+        Call the appropriate query method based on the selected method against a single engine.
+
+        :param engine: Engine the statement is executed against.
+        :param stmt: The base Select statement with filters applied.
+        :param synchronize_session: Strategy for synchronizing the session ('fetch', 'evaluate', False, 'auto').
+
+        :return: Result of the called query method.
+        """
+
         if self.method == "select":
             logging.info("Performing selection...")
-            return self.__query_select(stmt=stmt)
+            return self.__query_select(engine=engine, stmt=stmt)
+
+        elif self.method == "update" and self.params.bulk_values:
+            logging.info("Performing bulk values update...")
+            return self.__query_bulk_update(engine=engine, rows=self.params.bulk_values)
 
         elif self.method == "update":
             logging.info("Performing values update...")
-            return self.__query_update(stmt=stmt, synchronize_session=synchronize_session)
+            return self.__query_update(engine=engine, stmt=stmt, synchronize_session=synchronize_session)
+
+        elif self.method == "sync":
+            logging.info("Performing incremental selection...")
+            return self.__query_sync(engine=engine, stmt=stmt)
 
         else:
             logging.info("Performing columns deletion...")
-            return self.__query_delete(stmt=stmt, synchronize_session=synchronize_session)
+            return self.__query_delete(engine=engine, stmt=stmt, synchronize_session=synchronize_session)
+
+    def __query_sharded(self, stmt: Select, synchronize_session) -> bool | Iterable[Any]:
+        """
+        Route the statement to the owning shard or scatter it across every shard.
+
+        Statements filtered by equality on a shard key column are executed on a single shard.
+        Unkeyed selects are executed on all shards in parallel and merged in order_by order,
+        unkeyed updates and deletes are applied to every shard.
+
+        :param stmt: The base Select statement with filters applied.
+        :param synchronize_session: Strategy for synchronizing the session ('fetch', 'evaluate', False, 'auto').
+
+        :return: Result of the query, merged across shards when scattered.
+        """
+
+        engines = self.shards.engines
+        if not engines:
+            logging.error("No engines were provided for sharded query.")
+            return False
+
+        key_columns = self.__shard_key_columns()
+
+        # Refuse to move rows between shards by updating their shard key
+        if self.method == "update" and self.params.updated_values:
+            for key_column in key_columns:
+                for model in self.selection:
+                    if getattr(model, "__table__", None) is key_column.table \
+                            and key_column.key in self.params.updated_values:
+                        logging.error(f"Shard key column {key_column.table.name}.{key_column.key} cannot be updated.")
+                        return False
+
+        if self.method == "update" and self.params.bulk_values:
+            return self.__query_bulk_sharded(key_columns=key_columns)
+
+        key_value = self.__shard_key_value(stmt.whereclause, key_columns)
+        if key_value is not None:
+            index = self.__shard_index(key_value)
+            if index is None:
+                return False
+            logging.info(f"Routing query to shard {index}...")
+            return self.__query_engine(engine=engines[index], stmt=stmt, synchronize_session=synchronize_session)
+
+        if self.method == "sync":
+            logging.info(f"Following changes on all {len(engines)} shards...")
+            streams = [self.__query_sync(engine=engine, stmt=stmt) for engine in engines]
+            if any(stream is False for stream in streams):
+                return False
+            return heapq.merge(*streams, key=lambda row: (row[0].updated_at, row[0].id))
+
+        if self.method != "select":
+            logging.info(f"Applying query to all {len(engines)} shards...")
+            results = [
+                self.__query_engine(engine=engine, stmt=stmt, synchronize_session=synchronize_session)
+                for engine in engines
+            ]
+            return any(results)
+
+        order = None
+        if self.params.order_by and self.params.order_by.expressions and not self.params.exists:
+            order = self.__merge_order(dialect=engines[0].dialect)
+            if order is None:
+                return False
+
+        logging.info(f"Scattering selection across {len(engines)} shards...")
+        with ThreadPoolExecutor(max_workers=self.shards.max_workers or len(engines)) as executor:
+            if self.params.exists:
+                results = list(executor.map(lambda engine: self.__query_select(engine=engine, stmt=stmt), engines))
+                return any(results)
+
+            opened = list(executor.map(lambda engine: self.__open_stream(engine=engine, stmt=stmt), engines))
+
+        if any(result is None for result in opened):
+            logging.error("Selection failed on at least one shard.")
+            for result in opened:
+                if result is not None:
+                    result[0].close()
+            return False
+
+        return self.__merge_streams(opened=opened, order=order)
+
+    def __open_stream(self, engine: Engine, stmt: Select) -> Optional[tuple]:
+        """
+        Execute the selection on one shard and keep its session open to fetch rows lazily.
+
+        :param engine: Engine the statement is executed against.
+        :param stmt: The base Select statement with filters applied.
+        :return: Tuple of (session, result) or None if the selection failed.
+        """
+
+        session = Session(engine)
+        try:
+            result = session.execute(stmt.execution_options(yield_per=self.params.yield_per))
+            return session, result
+        except Exception as exception:
+            session.close()
+            logging.error(f"An error occurred during query execution. Details: {exception}")
+            return None
+
+    @staticmethod
+    def __merge_streams(opened: List[tuple], order: Optional[List[tuple]]) -> Iterator[Any]:
+        """
+        Merge lazily fetched shard results, keeping at most yield_per rows of each shard in memory.
+
+        Sessions of the shards are closed once the rows are exhausted or the iterator is closed.
+        """
+
+        try:
+            results = [result for _, result in opened]
+            if order:
+                yield from heapq.merge(*results, key=lambda row: _MergeKey(row, order))
+            else:
+                yield from itertools.chain(*results)
+        finally:
+            for session, _ in opened:
+                session.close()
+
+    def __query_bulk_sharded(self, key_columns: List[Any]) -> bool:
+        """
+        Split bulk update rows between shards.
+
+        Every row has to contain the shard key column of the updated model and is sent only to its shard.
+        Primary keys are allocated separately on each shard, so rows are never sent to all shards.
+        A shard key which is not the primary key (Post.author_id) is only used to route rows and
+        as an additional WHERE condition, so a row routed by a wrong shard key matches nothing.
+
+        :param key_columns: Shard key columns.
+        :return: True if rows were updated on any shard, False otherwise.
+        """
+
+        engines = self.shards.engines
+        rows = self.params.bulk_values
+
+        # Validate every row up front, so that no shard is updated when another one would reject its rows
+        if not self.__valid_bulk_rows(rows):
+            return False
+
+        table = getattr(self.selection[0], "__table__", self.selection[0])
+
+        table_key_columns = [key_column for key_column in key_columns if key_column.table is table]
+        if not table_key_columns:
+            logging.error(f"Bulk update of {table.name} requires a shard key column of the table in sharded mode.")
+            return False
+
+        # Prefer the primary key, other shard key columns are never updated
+        routing_column = next((key_column for key_column in table_key_columns if key_column.primary_key),
+                              table_key_columns[0])
+
+        if any(routing_column.key not in row for row in rows):
+            logging.error(f"Every row of bulk update must contain shard key {table.name}.{routing_column.key}.")
+            return False
+
+        match_keys = [] if routing_column.primary_key else [routing_column.key]
+
+        shard_rows = {}
+        for row in rows:
+            index = self.__shard_index(row[routing_column.key])
+            if index is None:
+                return False
+            shard_rows.setdefault(index, []).append(row)
+
+        logging.info(f"Routing bulk update to {len(shard_rows)} shards...")
+        return any([
+            self.__query_bulk_update(engine=engines[index], rows=part, match_keys=match_keys)
+            for index, part in shard_rows.items()
+        ])
+
+    def __shard_index(self, key_value: Any) -> Optional[int]:
+        """
+        Map a shard key value to the index of its engine.
+
+        :param key_value: Value of the shard key.
+        :return: Index of the engine or None if shard_key failed or returned an invalid index.
+        """
+
+        engines = self.shards.engines
+        shard_key = self.shards.shard_key or (lambda value: int(value) % len(engines))
+
+        try:
+            index = shard_key(key_value)
+        except Exception as exception:
+            logging.error(f"Shard key {key_value!r} could not be mapped to a shard. Details: {exception}")
+            return None
+
+        if not isinstance(index, int) or not 0 <= index < len(engines):
+            logging.error(f"Shard key {key_value!r} was mapped to invalid shard {index!r} of {len(engines)} shards.")
+            return None
+
+        return index
+
+    def __shard_key_columns(self) -> List[Any]:
+        """
+        Resolve shard key columns, defaulting to User.id and Post.author_id.
+        """
+
+        key_columns = self.shards.key_columns or [User.id, Post.author_id]
+        return [getattr(key_column, "expression", key_column) for key_column in key_columns]
+
+    def __shard_key_value(self, clause: Any, key_columns: List[Any]) -> Optional[Any]:
+        """
+        Find the single shard key value a where clause is bound to.
+
+        Only equality comparisons combined with AND are taken into account,
+        any other clause shape makes the query unkeyed.
+
+        :param clause: Where clause of the statement.
+        :param key_columns: Shard key columns.
+
+        :return: Shard key value or None if the query cannot be routed to one shard.
+        """
+
+        if clause is None:
+            return None
+
+        if isinstance(clause, BooleanClauseList):
+            if clause.operator is not operators.and_:
+                return None
+            key_values = {
+                value for value in (self.__shard_key_value(sub, key_columns) for sub in clause.clauses)
+                if value is not None
+            }
+            return key_values.pop() if len(key_values) == 1 else None
+
+        if isinstance(clause, BinaryExpression) and clause.operator is operators.eq:
+            for compared, value in ((clause.left, clause.right), (clause.right, clause.left)):
+                if isinstance(value, BindParameter) and any(
+                        getattr(compared, "table", None) is key.table and getattr(compared, "key", None) == key.key
+                        for key in key_columns
+                ):
+                    return value.value
+
+        return None
+
+    def __merge_order(self, dialect: Any) -> Optional[List[tuple]]:
+        """
+        Resolve order_by expressions into (column, descending, nulls_first) used to merge shard results.
+
+        NULL values are placed the way the dialect orders them, unless nulls_first()
+        or nulls_last() is given explicitly.
+
+        :param dialect: Dialect of the shards.
+        :return: List of order specifications or None if an expression cannot be merged.
+        """
+
+        # PostgreSQL and Oracle treat NULL as larger than any value, the rest as smaller
+        nulls_largest = dialect.name in ("postgresql", "oracle")
+
+        order = []
+        for expression in self.params.order_by.expressions:
+            descending = False
+            nulls_first = None
+
+            element = expression
+            while isinstance(element, UnaryExpression):
+                if element.modifier is operators.desc_op:
+                    descending = True
+                elif element.modifier is operators.nulls_first_op:
+                    nulls_first = True if nulls_first is None else nulls_first
+                elif element.modifier is operators.nulls_last_op:
+                    nulls_first = False if nulls_first is None else nulls_first
+                elif element.modifier is not operators.asc_op:
+                    logging.error(f"Order by expression {expression} cannot be merged across shards.")
+                    return None
+                element = element.element
+
+            order_column = getattr(element, "expression", element)
+            if getattr(order_column, "table", None) is None or not self.__in_selection(order_column):
+                logging.error(f"Order by column {expression} must be a column of the selection to merge shards.")
+                return None
+
+            if nulls_first is None:
+                nulls_first = nulls_largest if descending else not nulls_largest
+
+            order.append((order_column, descending, nulls_first))
+
+        return order
 
-    def __query_select(self, stmt: Select) -> bool | Iterable[Any]:
+    def __in_selection(self, order_column: Any) -> bool:
+        """
+        Check if a column is selected directly or as a part of a selected entity.
+        """
+
+        for item in self.selection:
+            if getattr(item, "__table__", None) is order_column.table:
+                return True
+            selected = getattr(item, "expression", item)
+            if getattr(selected, "table", None) is order_column.table \
+                    and getattr(selected, "key", None) == order_column.key:
+                return True
+        return False
+
+    def __query_select(self, engine: Engine, stmt: Select) -> bool | Iterable[Any]:
         """
         Function to select a row or a singular column from a database.
 
+        :param engine: Engine the statement is executed against.
         :param stmt: The base Select statement with filters applied.
         :return: True if parameter .exists() was passed otherwise a list of rows or columns.
         """
 
         try:
-            with Session(self.engine) as session:
+            with Session(engine) as session:
 
                 # Select all the results based on the provided filters
                 if self.params.exists:
@@ -136,10 +498,150 @@ class DatabaseMultifunctionalQuery:
             logging.error(f"Unexpected error occurred. Details: {exception}")
             return False
 
-    def __query_update(self, stmt: Select, synchronize_session) -> bool:
+    def __query_sync(self, engine: Engine, stmt: Select) -> bool | Iterator[Any]:
+        """
+        Function to select rows changed since the last incremental selection with the same filters.
+
+        A watermark of (updated_at, id) is kept per model and filter in the sqlamq_watermark table.
+        Rows are streamed in (updated_at, id) order and the watermark is advanced in one transaction
+        only after the caller has consumed all of them, so an interrupted sync is repeated next time.
+        Rows updated within the current second of the database, or within sync_lag seconds before it,
+        are delivered again by the next sync, as rows with a lower id or an earlier updated_at
+        may still be committed. updated_at is set when the writing statement or transaction starts
+        (now() on PostgreSQL is the transaction start time), so rows committed by transactions
+        running longer than sync_lag can still be missed.
+
+        :param engine: Engine the statement is executed against.
+        :param stmt: The base Select statement with filters applied.
+        :return: Iterator over changed rows or False if the selection is invalid.
+        """
+
+        if len(self.selection) != 1 or not hasattr(self.selection[0], "updated_at") \
+                or not hasattr(self.selection[0], "id"):
+            logging.error("Incremental selection requires a single model with 'updated_at' and 'id' columns.")
+            return False
+
+        if self.params.join:
+            logging.error("Join is not supported for incremental selection.")
+            return False
+
+        model = self.selection[0]
+        key = self.__watermark_key(model, stmt)
+
+        # SQLite compares datetimes as text, server defaults and bound values differ in fractional seconds
+        if engine.dialect.name == "sqlite":
+            updated_at = func.datetime(model.updated_at)
+            normalize = func.datetime
+        else:
+            updated_at = model.updated_at
+            normalize = lambda value: value
+
+        sync_stmt = select(model).order_by(updated_at, model.id)
+        if stmt.whereclause is not None:
+            sync_stmt = sync_stmt.where(stmt.whereclause)
+
+        return self.__stream_changes(engine, model, key, sync_stmt, updated_at, normalize)
+
+    def __stream_changes(
+            self, engine: Engine, model: Any, key: str, sync_stmt: Select, updated_at: Any, normalize: Any
+    ) -> Iterator[Any]:
+        """
+        Stream rows past the stored watermark and advance it once the rows are consumed.
+
+        The watermark only moves up to the last row updated before the current second of the database
+        minus sync_lag, newer rows are delivered again next time instead of being lost.
+        """
+
+        previous = None
+        settled = None
+        unsettled = 0
+
+        try:
+            with Session(engine) as session:
+                # Rows updated before the cutoff are not expected to be followed by rows with the same
+                # or an earlier updated_at, sync_lag covers writing transactions which are still open
+                cutoff = session.scalar(select(func.now())).replace(microsecond=0)
+                cutoff -= timedelta(seconds=self.params.sync_lag or 0)
+
+                watermark = session.get(Watermark, key)
+                if watermark:
+                    previous = (watermark.updated_at, watermark.last_id)
+                    sync_stmt = sync_stmt.where(or_(
+                        updated_at > normalize(watermark.updated_at),
+                        and_(updated_at == normalize(watermark.updated_at), model.id > watermark.last_id)
+                    ))
+
+                for row in session.execute(sync_stmt.execution_options(yield_per=self.params.yield_per)):
+                    if row[0].updated_at < cutoff:
+                        settled = (row[0].updated_at, row[0].id)
+                    else:
+                        unsettled += 1
+                    yield row
+
+        except SQLAlchemyError as sqle:
+            logging.error(f"SQLAlchemy error occurred, watermark was not advanced: {sqle}")
+            return
+
+        if unsettled:
+            logging.info(f"{unsettled} rows of {model.__tablename__} updated after {cutoff} will be selected again.")
+
+        if settled:
+            self.__advance_watermark(engine, model, key, previous, settled)
+        elif not unsettled:
+            logging.info(f"No changes in {model.__tablename__} since the last incremental selection.")
+
+    @staticmethod
+    def __advance_watermark(engine: Engine, model: Any, key: str, previous: Optional[tuple], last: tuple) -> bool:
+        """
+        Move the watermark from previous to last position in a single transaction.
+
+        The update is conditional on the previous position, so concurrent consumers
+        of the same filter cannot move the watermark backwards.
+        """
+
+        try:
+            with Session(engine) as session, session.begin():
+                if previous is None:
+                    session.add(Watermark(key=key, table_name=model.__tablename__, updated_at=last[0], last_id=last[1]))
+                    rowcount = 1
+                else:
+                    result = session.execute(
+                        update(Watermark)
+                        .where(Watermark.key == key, Watermark.updated_at == previous[0], Watermark.last_id == previous[1])
+                        .values(updated_at=last[0], last_id=last[1])
+                    )
+                    rowcount = result.rowcount
+
+        except IntegrityError:
+            rowcount = 0
+        except SQLAlchemyError as sqle:
+            logging.error(f"SQLAlchemy error occurred while advancing watermark: {sqle}")
+            return False
+
+        if rowcount == 0:
+            logging.warning(f"Watermark of {model.__tablename__} was advanced concurrently, keeping the newer one.")
+            return False
+
+        logging.info(f"Watermark of {model.__tablename__} was advanced to {last}.")
+        return True
+
+    @staticmethod
+    def __watermark_key(model: Any, stmt: Select) -> str:
+        """
+        Build a stable key of the model and filters the watermark belongs to.
+        """
+
+        fingerprint = model.__tablename__
+        if stmt.whereclause is not None:
+            compiled = stmt.whereclause.compile()
+            fingerprint += f"|{compiled}|{sorted(compiled.params.items())!r}"
+        return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+    def __query_update(self, engine: Engine, stmt: Select, synchronize_session) -> bool:
         """
         Update rows in the database based on the given statement and updated values.
 
+        :param engine: Engine the statement is executed against.
         :param stmt: The base Select statement with filters applied.
         :param synchronize_session: Strategy for synchronizing the session ('fetch', 'evaluate', False, 'auto').
 
@@ -157,10 +659,14 @@ class DatabaseMultifunctionalQuery:
                 logging.error("No values provided for updating columns.")
                 return False
 
+            # Bump updated_at, server_onupdate only marks the column and is not emitted on update
+            if hasattr(self.selection[0], "updated_at") and "updated_at" not in updated_values:
+                updated_values = {**updated_values, "updated_at": func.now()}
+
             # Create an update statement
             update_stmt = update(*self.selection).where(stmt.whereclause).values(updated_values)
 
-            with Session(self.engine) as session:
+            with Session(engine) as session:
                 # Execute update statement with session synchronization
                 result = session.execute(update_stmt.execution_options(synchronize_session=synchronize_session))
 
@@ -185,10 +691,137 @@ class DatabaseMultifunctionalQuery:
             logging.error(f"Unexpected error: {exception}")
             return False
 
-    def __query_delete(self, stmt: Select, synchronize_session) -> bool:
+    def __query_bulk_update(self, engine: Engine, rows: List[dict], match_keys: List[str] = None) -> bool:
+        """
+        Update many rows, each with its own values, addressed by primary key.
+
+        Rows are sent in chunks of chunk_size inside one transaction, as executemany
+        UPDATE ... WHERE id = :id or, on PostgreSQL, as one UPDATE ... FROM (VALUES ...) per chunk.
+
+        :param engine: Engine the statement is executed against.
+        :param rows: List of {primary_key..., column: value} mappings.
+        :param match_keys: Additional columns of the rows used in WHERE instead of SET.
+
+        :return: bool: True if rows were updated, False otherwise.
+        """
+
+        try:
+            if not self.__valid_bulk_rows(rows):
+                return False
+
+            table = getattr(self.selection[0], "__table__", self.selection[0])
+            primary_keys = [key_column.key for key_column in table.primary_key.columns] + (match_keys or [])
+
+            # Rows sharing the same columns can be sent in one batch
+            groups = {}
+            for row in rows:
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+
+            chunk_size = self.params.chunk_size or len(rows)
+            total_updated = 0
+
+            with Session(engine) as session, session.begin():
+                for columns, group in groups.items():
+                    updated_columns = [name for name in columns if name not in primary_keys]
+                    if not updated_columns:
+                        logging.warning(f"Skipping {len(group)} rows without values to update.")
+                        continue
+
+                    for start in range(0, len(group), chunk_size):
+                        chunk = group[start:start + chunk_size]
+                        if engine.dialect.name == "postgresql":
+                            total_updated += self.__update_from_values(session, table, primary_keys, columns, chunk)
+                        else:
+                            total_updated += self.__update_executemany(session, table, primary_keys, chunk)
+
+            if total_updated >= 1:
+                logging.info(f"{total_updated} rows were updated successfully.")
+                return True
+            else:
+                logging.info("No rows were updated. Check the provided primary keys and values.")
+                return False
+
+        except CompileError as error:
+            logging.error(f"SQL compilation error: {error}")
+            return False
+        except SQLAlchemyError as sqle:
+            logging.error(f"SQLAlchemy error occurred: {sqle}")
+            return False
+        except Exception as exception:
+            logging.error(f"Unexpected error: {exception}")
+            return False
+
+    def __valid_bulk_rows(self, rows: List[dict]) -> bool:
+        """
+        Check that bulk update rows address a single table by primary key and only name its columns.
+
+        :param rows: List of {primary_key..., column: value} mappings.
+        :return: True if rows can be updated, False otherwise.
+        """
+
+        if len(self.selection) != 1:
+            logging.error("Bulk update requires a single table or model.")
+            return False
+
+        table = getattr(self.selection[0], "__table__", self.selection[0])
+        primary_keys = [key_column.key for key_column in table.primary_key.columns]
+
+        if not primary_keys or any(key not in row for row in rows for key in primary_keys):
+            logging.error(f"Every row of bulk update must contain primary key {primary_keys} of {table.name}.")
+            return False
+
+        unknown_columns = sorted({name for row in rows for name in row if name not in table.c})
+        if unknown_columns:
+            logging.error(f"Unknown columns {unknown_columns} of {table.name} in bulk update.")
+            return False
+
+        return True
+
+    @staticmethod
+    def __update_executemany(session: Session, table: Table, match_keys: List[str], chunk: List[dict]) -> int:
+        """
+        Update a chunk of rows with a single executemany UPDATE ... WHERE id = :id.
+        """
+
+        # Key parameters are renamed, so that they are not taken for SET values
+        update_stmt = update(table).where(*[table.c[key] == bindparam(f"match_{key}") for key in match_keys])
+        if "updated_at" in table.c and "updated_at" not in chunk[0]:
+            update_stmt = update_stmt.values(updated_at=func.now())
+
+        parameters = [
+            {f"match_{name}" if name in match_keys else name: value for name, value in row.items()}
+            for row in chunk
+        ]
+        return session.execute(update_stmt, parameters).rowcount
+
+    @staticmethod
+    def __update_from_values(
+            session: Session, table: Table, match_keys: List[str], columns: tuple, chunk: List[dict]
+    ) -> int:
+        """
+        Update a chunk of rows with a single UPDATE ... FROM (VALUES ...) statement.
+        """
+
+        bulk_values = values(
+            *[column(name, table.c[name].type) for name in columns], name="bulk_values"
+        ).data([tuple(row[name] for name in columns) for row in chunk])
+
+        updated_values = {name: bulk_values.c[name] for name in columns if name not in match_keys}
+        if "updated_at" in table.c and "updated_at" not in updated_values:
+            updated_values["updated_at"] = func.now()
+
+        update_stmt = (
+            update(table)
+            .where(*[table.c[key] == bulk_values.c[key] for key in match_keys])
+            .values(updated_values)
+        )
+        return session.execute(update_stmt).rowcount
+
+    def __query_delete(self, engine: Engine, stmt: Select, synchronize_session) -> bool:
         """
         Deletes rows from the database based on the given statement.
 
+        :param: engine: Engine the statement is executed against.
         :param: stmt: The base Select statement with filters applied.
         :param: synchronize_session: Strategy for synchronizing the session ('fetch', 'evaluate', 'false', 'auto').
 
@@ -205,12 +838,12 @@ class DatabaseMultifunctionalQuery:
             for model in self.selection:
                 if issubclass(model, DeclarativeBase):
                     # Handle ORM models
-                    rows_deleted = self.__delete_orm_model(model, stmt)
+                    rows_deleted = self.__delete_orm_model(engine, model, stmt)
                     total_deleted += rows_deleted
 
                 elif isinstance(model, Table):
                     # Handle raw SQL tables
-                    rows_deleted = self.__delete_sql_table(model, stmt, synchronize_session)
+                    rows_deleted = self.__delete_sql_table(engine, model, stmt, synchronize_session)
                     total_deleted += rows_deleted
 
                 # Final log
@@ -231,12 +864,12 @@ class DatabaseMultifunctionalQuery:
             logging.error(f"Unexpected error: {exception}")
             return False
 
-    def __delete_orm_model(self, model: Any, stmt: Select) -> int:
+    def __delete_orm_model(self, engine: Engine, model: Any, stmt: Select) -> int:
         """
         Deletes rows from an ORM model using filters from the given statement.
         """
         try:
-            with Session(self.engine) as session:
+            with Session(engine) as session:
                 objects = session.query(model).filter(stmt.whereclause).all()
                 if objects:
                     for obj in objects:
@@ -251,12 +884,12 @@ class DatabaseMultifunctionalQuery:
             logging.error(f"Error deleting ORM model {model.__name__}: {e}")
             return 0
 
-    def __delete_sql_table(self, table: Table, stmt: Select, synchronize_session: str | bool) -> int:
+    def __delete_sql_table(self, engine: Engine, table: Table, stmt: Select, synchronize_session: str | bool) -> int:
         """
         Deletes rows from a raw SQL table using filters from the given statement.
         """
         try:
-            with Session(self.engine) as session:
+            with Session(engine) as session:
                 delete_stmt = delete(table).where(stmt.whereclause)
                 result = session.execute(delete_stmt.execution_options(synchronize_session=synchronize_session))
                 session.commit()
@@ -270,10 +903,12 @@ class DatabaseMultifunctionalQuery:
             logging.error(f"Error deleting rows from table {table.name}: {e}")
             return 0
 
-    def __query_drop(self):
+    def __query_drop(self, engine: Engine):
         """
         Function to delete singular table or multiple tables
 
+        :param engine: Engine the tables are dropped from.
+
         :return: True if some of the tables were deleted, otherwise False
         """
 
@@ -285,7 +920,7 @@ class DatabaseMultifunctionalQuery:
                     try:
                         if hasattr(table, "__table__"):
                             logging.info(f"Attempting to delete table -> {table.__tablename__}")
-                            table.__table__.drop(self.engine, checkfirst=True)  # Ensures table exists before dropping
+                            table.__table__.drop(engine, checkfirst=True)  # Ensures table exists before dropping
                             total += 1
                         else:
                             logging.warning(f"Skipping invalid selection -> {table}")
@@ -306,6 +941,48 @@ class DatabaseMultifunctionalQuery:
             return False
 
 
+class _MergeKey:
+    """
+    Sort key of a row used to merge ordered results coming from different shards.
+
+    Follows direction and NULL placement of every order_by column,
+    so that the merged order matches the order inside each shard.
+    """
+
+    __slots__ = ("values", "order")
+
+    def __init__(self, row: Any, order: List[tuple]):
+        self.values = [_MergeKey.row_value(row, order_column) for order_column, _, _ in order]
+        self.order = order
+
+    def __lt__(self, other: "_MergeKey") -> bool:
+        for value, other_value, (_, descending, nulls_first) in zip(self.values, other.values, self.order):
+            if value is None and other_value is None:
+                continue
+            if value is None or other_value is None:
+                return (value is None) == nulls_first
+            if value == other_value:
+                continue
+            less = value < other_value
+            return not less if descending else less
+        return False
+
+    @staticmethod
+    def row_value(row: Any, order_column: Any) -> Any:
+        """
+        Read the value of a column from a row with either selected columns or ORM entities.
+        """
+
+        if order_column in row._mapping:
+            return row._mapping[order_column]
+
+        for item in row:
+            if getattr(item, "__table__", None) is order_column.table:
+                return getattr(item, order_column.key)
+
+        raise KeyError(f"Order by column {order_column} is not part of the selection.")
+
+
 def main() -> None:
 
     """
@@ -320,6 +997,9 @@ def main() -> None:
     # Create an engine with database link linked to it
     engine = create_engine(sqlalchemy_url_builder(), echo=True, poolclass=NullPool)
 
+    # Apply performance pragmas on connect if the database is SQLite
+    sqlite_performance_profile(engine)
+
     # Create all models that bounded to the engine
     Base.metadata.create_all(bind=engine)
 
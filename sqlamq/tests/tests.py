@@ -1,15 +1,21 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import List, Any, Iterable, Literal
 
-from sqlalchemy import create_engine, Engine, or_, and_
+from sqlalchemy import create_engine, Engine, or_, and_, event
 from sqlalchemy.orm import Session
 
-from sqlamq.config.data import sqlalchemy_url_builder, QueryParams, FilterParams, JoinParams, OrderByParams
+from sqlamq.config.data import sqlalchemy_url_builder, sqlite_performance_profile, QueryParams, FilterParams, JoinParams, OrderByParams, ShardParams
 from sqlamq.connector import setup_logging, DatabaseMultifunctionalQuery
+from sqlamq.utils.scheduler import QueryScheduler
 from sqlamq.utils.sqla_api.models.models import User, Post, Base
 
+import os
 import random
+import sys
 import logging
+import tempfile
+import threading
+import time
 
 
 test_users = [
@@ -72,6 +78,9 @@ def execute_tests():
     # Create an engine with database link linked to it
     engine = create_engine(sqlalchemy_url_builder(), echo=True)
 
+    # Apply performance pragmas on connect if the database is SQLite
+    sqlite_performance_profile(engine)
+
     # Create all models that bounded to the engine
     Base.metadata.create_all(bind=engine)
 
@@ -222,6 +231,23 @@ def execute_tests():
     #
     # True
 
+    # execute_select_queries(
+    #     engine=engine,
+    #     method="update",
+    #     selection=[User],
+    #     params=QueryParams(
+    #         bulk_values=[
+    #             {"id": 1, "username": "anthony6789"},
+    #             {"id": 2, "username": "jake78ty"}
+    #         ],
+    #         chunk_size=1000
+    #     )
+    # )
+
+    # Output:
+    #
+    # True
+
     # execute_select_queries(
     #     engine=engine,
     #     method="delete",
@@ -243,10 +269,46 @@ def execute_tests():
     #     selection=[Post]
     # )
 
+    # shard_engines = [create_engine(f"sqlite:///./shard_{i}.db") for i in range(2)]
+    #
+    # execute_select_queries(
+    #     engine=ShardParams(engines=shard_engines),
+    #     method="select",
+    #     selection=[Post],
+    #     params=QueryParams(
+    #         filter=FilterParams(
+    #             expressions=[Post.post_id >= 50000]
+    #         ),
+    #         order_by=OrderByParams(
+    #             expressions=[Post.post_id]
+    #         )
+    #     )
+    # )
+
+    # Output (rows of both shards merged in post_id order):
+    #
+    # (Post(id=1, post_id=53196, author_id=2, category='Sport', content='You have to get yourself involved into sport.', created_at=datetime.datetime(2024, 12, 24, 19, 5, 33)),)
+    # (Post(id=2, post_id=64913, author_id=1, category='Family', content='My family consists of 5 people.', created_at=datetime.datetime(2024, 12, 24, 19, 5, 33)),)
+
+    # execute_select_queries(
+    #     engine=engine,
+    #     method="sync",
+    #     selection=[Post],
+    #     params=QueryParams(
+    #         filter=FilterParams(
+    #             expressions=[Post.category == "Tech"]
+    #         )
+    #     )
+    # )
+
+    # Output (only on the first run, next runs print rows updated since then):
+    #
+    # (Post(id=4, post_id=42258, author_id=4, category='Tech', content='You should a little knowledge about tech in 21st century.', created_at=datetime.datetime(2024, 12, 23, 0, 0)),)
+
 
 def execute_select_queries(
-        engine: Engine,
-        method: Literal["select", "update", "delete", "drop"],
+        engine: Engine | ShardParams,
+        method: Literal["select", "update", "delete", "drop", "sync"],
         selection: List[Any],
         params: QueryParams = None
 ):
@@ -269,8 +331,328 @@ def execute_select_queries(
         print(result)
 
 
+def execute_checks():
+
+    # Execute logging function
+    setup_logging()
+
+    # Check that keyed queries are routed to a single shard
+    execute_shard_routing_check()
+
+    # Check that incremental selection returns rows written in the watermark second
+    execute_sync_watermark_check()
+
+    # Check priority ordering, class limits, rejection and slots held by lazy results of the scheduler
+    execute_scheduler_check()
+
+    # Check grouping, chunking, validation and shard routing of bulk updates
+    execute_bulk_update_check()
+
+
+def execute_shard_routing_check():
+    with tempfile.TemporaryDirectory() as directory:
+        shard_engines = [create_engine(f"sqlite:///{os.path.join(directory, f'shard_{i}.db')}") for i in range(2)]
+
+        executed_on = []
+        for index, shard_engine in enumerate(shard_engines):
+            Base.metadata.create_all(bind=shard_engine)
+            event.listen(shard_engine, "before_cursor_execute", lambda *args, shard=index: executed_on.append(shard))
+
+        shards = ShardParams(engines=shard_engines)
+
+        with Session(shard_engines[1]) as session:
+            session.add(User(id=3, username="mot6hfg3"))
+            session.commit()
+
+        executed_on.clear()
+        result = DatabaseMultifunctionalQuery(
+            engine=shards,
+            method="select",
+            selection=[User],
+            params=QueryParams(filter=FilterParams(expressions=[User.id == 3]))
+        ).query()
+        assert [row[0].username for row in result] == ["mot6hfg3"]
+        assert set(executed_on) == {1}, executed_on
+
+        executed_on.clear()
+        result = DatabaseMultifunctionalQuery(
+            engine=shards,
+            method="update",
+            selection=[User],
+            params=QueryParams(
+                filter=FilterParams(and_=[and_(User.id == 3, User.username == "mot6hfg3")]),
+                updated_values={"username": "mot6hfg4"}
+            )
+        ).query()
+        assert result is True
+        assert set(executed_on) == {1}, executed_on
+
+        for shard_engine in shard_engines:
+            shard_engine.dispose()
+
+    logging.info("Keyed queries were routed to a single shard.")
+
+
+def execute_sync_watermark_check():
+    with tempfile.TemporaryDirectory() as directory:
+        sync_engine = create_engine(f"sqlite:///{os.path.join(directory, 'sync.db')}")
+        Base.metadata.create_all(bind=sync_engine)
+
+        def sync() -> List[int]:
+            result = DatabaseMultifunctionalQuery(engine=sync_engine, method="sync", selection=[User]).query()
+            return [row[0].id for row in result]
+
+        with Session(sync_engine) as session:
+            session.add_all([User(id=1, username="anthony2345"), User(id=3, username="mot6hfg3")])
+            session.commit()
+
+        # Let the rows settle, so that the watermark is advanced past them
+        time.sleep(1.1)
+        assert sync() == [1, 3]
+
+        with Session(sync_engine) as session:
+            session.add(User(id=4, username="jfg4567"))
+            session.commit()
+        assert 4 in sync()
+
+        # A lower id written in the same second as the previous sync must not be lost
+        with Session(sync_engine) as session:
+            session.add(User(id=2, username="jake56gh"))
+            session.commit()
+        assert {2, 4} <= set(sync())
+
+        time.sleep(1.1)
+        sync()
+        assert sync() == []
+
+        # A row committed by a transaction that started before the previous sync is kept within sync_lag
+        def lagged_sync() -> List[int]:
+            result = DatabaseMultifunctionalQuery(
+                engine=sync_engine,
+                method="sync",
+                selection=[Post],
+                params=QueryParams(sync_lag=30)
+            ).query()
+            return [row[0].id for row in result]
+
+        started = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0) - timedelta(seconds=5)
+        with Session(sync_engine) as session:
+            session.add(Post(id=2, post_id=31765, author_id=2, category="Sport", content="Sport", updated_at=started))
+            session.commit()
+        assert lagged_sync() == [2]
+
+        with Session(sync_engine) as session:
+            session.add(Post(id=1, post_id=47456, author_id=1, category="Family", content="Family", updated_at=started))
+            session.commit()
+        assert lagged_sync() == [1, 2]
+
+        sync_engine.dispose()
+
+    logging.info("Incremental selection returned rows of the watermark second.")
+
+
+def execute_scheduler_check():
+    # Queued queries are admitted by priority, not by arrival
+    scheduler = QueryScheduler(max_concurrency=1, max_wait=5.0)
+    gate = threading.Event()
+    admitted = []
+
+    def submit(priority: str) -> threading.Thread:
+        thread = threading.Thread(target=scheduler.run, args=(priority, lambda: admitted.append(priority)))
+        thread.start()
+        # Give the thread time to enter the queue, so that arrival order is known
+        time.sleep(0.05)
+        return thread
+
+    holder = threading.Thread(target=scheduler.run, args=("interactive", gate.wait))
+    holder.start()
+    time.sleep(0.05)
+    waiting = [submit("batch"), submit("normal"), submit("interactive")]
+    gate.set()
+    for thread in [holder, *waiting]:
+        thread.join()
+    assert admitted == ["interactive", "normal", "batch"], admitted
+
+    # Batch queries never exceed their class limit, interactive ones are admitted next to them
+    scheduler = QueryScheduler(max_concurrency=3, limits={"batch": 1}, max_wait=5.0)
+    running = {"batch": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def batch_job():
+        with lock:
+            running["batch"] += 1
+            running["peak"] = max(running["peak"], running["batch"])
+        time.sleep(0.1)
+        with lock:
+            running["batch"] -= 1
+
+    threads = [threading.Thread(target=scheduler.run, args=("batch", batch_job)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    assert scheduler.run("interactive", lambda: True) is True
+    for thread in threads:
+        thread.join()
+    assert running["peak"] == 1, running
+    assert scheduler.metrics()["interactive"].max_queue_wait < 0.05
+
+    # A sync stream holds its slot until it is closed or exhausted, queries waiting longer than max_wait are rejected
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler_engine = create_engine(f"sqlite:///{os.path.join(directory, 'scheduler.db')}")
+        Base.metadata.create_all(bind=scheduler_engine)
+
+        with Session(scheduler_engine) as session:
+            session.add_all([User(id=1, username="anthony2345"), User(id=2, username="jake56gh")])
+            session.commit()
+
+        scheduler = QueryScheduler(max_concurrency=1, max_wait=0.2)
+
+        def sync():
+            return DatabaseMultifunctionalQuery(
+                engine=scheduler_engine,
+                method="sync",
+                selection=[User],
+                scheduler=scheduler
+            ).query()
+
+        def select():
+            return DatabaseMultifunctionalQuery(
+                engine=scheduler_engine,
+                method="select",
+                selection=[User],
+                params=QueryParams(filter=FilterParams(expressions=[User.id == 1])),
+                scheduler=scheduler
+            ).query()
+
+        stream = sync()
+        next(stream)
+        assert select() is False
+        assert sync() is False
+        assert scheduler.metrics()["interactive"].rejected == 1
+        assert scheduler.metrics()["batch"].rejected == 1
+
+        stream.close()
+        assert len(select()) == 1
+
+        list(sync())
+        assert len(select()) == 1
+
+        scheduler_engine.dispose()
+
+    logging.info("Scheduler admitted queries by priority within class limits.")
+
+
+def execute_bulk_update_check():
+    with tempfile.TemporaryDirectory() as directory:
+        bulk_engine = create_engine(f"sqlite:///{os.path.join(directory, 'bulk.db')}")
+        Base.metadata.create_all(bind=bulk_engine)
+
+        with Session(bulk_engine) as session:
+            session.add_all([
+                User(id=user_id, username=f"user{user_id}", posts=[Post(
+                    id=user_id,
+                    post_id=10000 + user_id,
+                    category="Family",
+                    content="My family consists of 5 people."
+                )])
+                for user_id in range(1, 5)
+            ])
+            session.commit()
+
+        # Number of parameter sets of every executed UPDATE
+        batches = []
+        event.listen(
+            bulk_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, parameters, context, executemany: batches.append(
+                len(parameters) if executemany else 1
+            ) if statement.startswith("UPDATE") else None
+        )
+
+        def bulk_update(rows: List[dict]):
+            return DatabaseMultifunctionalQuery(
+                engine=bulk_engine,
+                method="update",
+                selection=[Post],
+                params=QueryParams(bulk_values=rows, chunk_size=2)
+            ).query()
+
+        # Rows with the same columns are grouped, each group is split into chunks
+        assert bulk_update([
+            {"id": 1, "content": "First"},
+            {"id": 2, "category": "Sport", "content": "Second"},
+            {"id": 3, "content": "Third"},
+            {"id": 4, "content": "Fourth"},
+        ]) is True
+        assert batches == [2, 1, 1], batches
+
+        with Session(bulk_engine) as session:
+            posts = session.query(Post.id, Post.category, Post.content).order_by(Post.id).all()
+        assert posts == [
+            (1, "Family", "First"), (2, "Sport", "Second"), (3, "Family", "Third"), (4, "Family", "Fourth")
+        ], posts
+
+        # Unknown columns are rejected before anything is executed
+        batches.clear()
+        assert bulk_update([{"id": 1, "contnt": "Typo"}]) is False
+        assert batches == [], batches
+
+        bulk_engine.dispose()
+
+    with tempfile.TemporaryDirectory() as directory:
+        shard_engines = [create_engine(f"sqlite:///{os.path.join(directory, f'shard_{i}.db')}") for i in range(2)]
+
+        # Post ids are allocated per shard, so post 1 exists on both shards with different authors
+        for index, shard_engine in enumerate(shard_engines):
+            Base.metadata.create_all(bind=shard_engine)
+            with Session(shard_engine) as session:
+                session.add(User(id=index + 2, username=f"user{index + 2}", posts=[Post(
+                    id=1,
+                    post_id=10000 + index,
+                    category="Family",
+                    content="Original"
+                )]))
+                session.commit()
+
+        def sharded_bulk_update(rows: List[dict]):
+            return DatabaseMultifunctionalQuery(
+                engine=ShardParams(engines=shard_engines),
+                method="update",
+                selection=[Post],
+                params=QueryParams(bulk_values=rows)
+            ).query()
+
+        def contents() -> List[str]:
+            result = []
+            for shard_engine in shard_engines:
+                with Session(shard_engine) as session:
+                    result.append(session.query(Post.content).scalar())
+            return result
+
+        # Rows without the shard key cannot be routed and are not sent to every shard
+        assert sharded_bulk_update([{"id": 1, "content": "Broadcast"}]) is False
+        assert contents() == ["Original", "Original"]
+
+        # Rows are routed by author_id, other shards are left untouched
+        assert sharded_bulk_update([{"id": 1, "author_id": 3, "content": "Routed"}]) is True
+        assert contents() == ["Original", "Routed"]
+
+        # author_id is matched in WHERE, so a row with a wrong author updates nothing
+        assert sharded_bulk_update([{"id": 1, "author_id": 4, "content": "Wrong"}]) is False
+        assert contents() == ["Original", "Routed"]
+
+        for shard_engine in shard_engines:
+            shard_engine.dispose()
+
+    logging.info("Bulk updates were grouped, chunked and routed to their shards.")
+
+
 if __name__ == "__main__":
     try:
-        execute_tests()
+        # Self-checks run on temporary SQLite databases: python -m sqlamq.tests.tests checks
+        if "checks" in sys.argv[1:]:
+            execute_checks()
+        else:
+            execute_tests()
     except (KeyboardInterrupt, SystemExit):
         logging.error("Program was finished.")
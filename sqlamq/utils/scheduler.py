@@ -0,0 +1,259 @@
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional
+
+from sqlalchemy import Engine, QueuePool
+
+Priority = Literal["interactive", "normal", "batch"]
+
+# Lower rank is admitted first
+PRIORITY_RANKS = {"interactive": 0, "normal": 1, "batch": 2}
+
+
+@dataclass
+class SchedulerMetrics:
+    admitted: int = 0
+    rejected: int = 0
+    queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+    execution: float = 0.0
+    max_execution: float = 0.0
+
+
+class QueryScheduler:
+    """
+    Admission control in front of the connection pool.
+
+    Every query takes one of max_concurrency slots before touching the database.
+    Each priority class is capped by its own limit, so batch jobs cannot take over
+    the whole pool, and free slots are handed to waiting queries by priority and
+    then by arrival. Queries waiting longer than max_wait are rejected.
+    With max_concurrency of None queries are never queued, only metrics are recorded.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: Optional[int] = 5,
+            limits: Optional[Dict[str, Optional[int]]] = None,
+            max_wait: Optional[float] = 30.0
+    ):
+        self.max_concurrency = max_concurrency
+        if max_concurrency is None:
+            default_limits = {priority: None for priority in PRIORITY_RANKS}
+        else:
+            default_limits = {
+                "interactive": max_concurrency,
+                "normal": max(1, max_concurrency - 1),
+                "batch": max(1, max_concurrency // 2),
+            }
+        self.limits = {**default_limits, **(limits or {})}
+        self.max_wait = max_wait
+
+        self.__condition = threading.Condition()
+        self.__counter = itertools.count()
+        self.__waiting: List[tuple] = []
+        self.__running = {priority: 0 for priority in PRIORITY_RANKS}
+        self.__metrics = {priority: SchedulerMetrics() for priority in PRIORITY_RANKS}
+
+    def run(self, priority: Priority, function: Callable[[], Any]) -> Any:
+        """
+        Function to execute a query once it is admitted.
+
+        A lazy result (an iterator) keeps its connections until it is consumed, so the slot
+        is held by the returned ScheduledStream until the rows are exhausted or the stream
+        is closed, execution time then includes the time the caller spends between rows.
+
+        :param priority: Priority class of the query.
+        :param function: Function executing the query.
+
+        :return: Result of the function or False if the query was not admitted in time.
+        """
+
+        if not self.__acquire(priority):
+            return False
+
+        started = time.monotonic()
+        try:
+            result = function()
+        except BaseException:
+            self.__release(priority, time.monotonic() - started)
+            raise
+
+        if isinstance(result, Iterator):
+            return ScheduledStream(result, release=lambda elapsed: self.__release(priority, elapsed), started=started)
+
+        self.__release(priority, time.monotonic() - started)
+        return result
+
+    def metrics(self) -> Dict[str, SchedulerMetrics]:
+        """
+        Function to get a snapshot of queue wait and execution time per priority class.
+
+        :return: Dictionary of {priority: metrics}.
+        """
+
+        with self.__condition:
+            return {priority: replace(metrics) for priority, metrics in self.__metrics.items()}
+
+    def __acquire(self, priority: Priority) -> bool:
+        """
+        Wait for a free slot in priority order, returns False once max_wait is exceeded.
+        """
+
+        if priority not in PRIORITY_RANKS:
+            logging.error(f"Invalid priority '{priority}'. Please use 'interactive', 'normal' or 'batch'.")
+            return False
+
+        entry = (PRIORITY_RANKS[priority], next(self.__counter), priority)
+        enqueued = time.monotonic()
+        deadline = None if self.max_wait is None else enqueued + self.max_wait
+
+        with self.__condition:
+            self.__waiting.append(entry)
+            self.__waiting.sort()
+
+            while self.__next_admitted() is not entry:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    self.__waiting.remove(entry)
+                    self.__metrics[priority].rejected += 1
+                    # Queries queued behind this one may be admissible now
+                    self.__condition.notify_all()
+                    logging.error(f"Query with {priority} priority was not admitted within {self.max_wait} seconds.")
+                    return False
+                self.__condition.wait(timeout)
+
+            self.__waiting.remove(entry)
+            self.__running[priority] += 1
+
+            waited = time.monotonic() - enqueued
+            metrics = self.__metrics[priority]
+            metrics.admitted += 1
+            metrics.queue_wait += waited
+            metrics.max_queue_wait = max(metrics.max_queue_wait, waited)
+
+            self.__condition.notify_all()
+            return True
+
+    def __release(self, priority: Priority, elapsed: float) -> None:
+        """
+        Free the slot and record execution time of the query.
+        """
+
+        with self.__condition:
+            self.__running[priority] -= 1
+
+            metrics = self.__metrics[priority]
+            metrics.execution += elapsed
+            metrics.max_execution = max(metrics.max_execution, elapsed)
+
+            self.__condition.notify_all()
+
+    def __next_admitted(self) -> Optional[tuple]:
+        """
+        Find the first waiting query which fits into both total and class limits.
+        """
+
+        if self.max_concurrency is not None and sum(self.__running.values()) >= self.max_concurrency:
+            return None
+
+        for entry in self.__waiting:
+            priority = entry[2]
+            if self.limits[priority] is None or self.__running[priority] < self.limits[priority]:
+                return entry
+
+        return None
+
+
+class ScheduledStream:
+    """
+    Iterator over a lazy query result which gives its scheduler slot back once done.
+
+    The slot is released when the rows are exhausted, iteration fails or close() is called,
+    so a partially consumed stream should be closed to free the slot for other queries.
+    """
+
+    def __init__(self, rows: Iterable[Any], release: Callable[[float], None], started: Optional[float] = None):
+        self.__rows = iter(rows)
+        self.__release = release
+        self.__started = time.monotonic() if started is None else started
+        self.__released = False
+
+    def __iter__(self) -> "ScheduledStream":
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self.__rows)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """
+        Stop consuming rows and release the slot.
+        """
+
+        if self.__released:
+            return
+        self.__released = True
+
+        try:
+            if hasattr(self.__rows, "close"):
+                self.__rows.close()
+        finally:
+            self.__release(time.monotonic() - self.__started)
+
+    def __del__(self):
+        self.close()
+
+
+_schedulers: Dict[tuple, QueryScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def pool_capacity(engine: Engine) -> Optional[int]:
+    """
+    Function to get the number of connections the engine can open at the same time.
+
+    :param engine: Engine with a connection pool.
+    :return: pool_size + max_overflow of a queue pool or None if the pool is not limited.
+    """
+
+    pool = engine.pool
+    if isinstance(pool, QueuePool) and pool._max_overflow >= 0:
+        return pool.size() + pool._max_overflow
+    return None
+
+
+def scheduler_for(engines: Iterable[Engine]) -> QueryScheduler:
+    """
+    Function to get the default scheduler of an engine or of a set of shard engines.
+
+    The scheduler is created on first use and sized to the smallest pool of the engines,
+    engines without a limited pool (NullPool, StaticPool etc.) are not queued.
+
+    :param engines: Engines the queries are executed against.
+    :return: Scheduler shared by all queries against the same engines.
+    """
+
+    engines = list(engines)
+    key = tuple(id(engine) for engine in engines)
+
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            capacities = [capacity for capacity in map(pool_capacity, engines) if capacity is not None]
+            scheduler = QueryScheduler(max_concurrency=min(capacities) if capacities else None)
+            _schedulers[key] = scheduler
+
+            # Forget the scheduler together with its engines
+            for engine in engines:
+                weakref.finalize(engine, _schedulers.pop, key, None)
+
+        return scheduler
@@ -42,3 +42,14 @@ class Post(Base):
 
     def __repr__(self) -> str:
         return f"Post(id={self.id!r}, post_id={self.post_id!r}, author_id={self.author_id!r}, category={self.category!r}, content={self.content!r}, created_at={self.created_at!r})"
+
+
+class Watermark(Base):
+    __tablename__ = "sqlamq_watermark"
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(100))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_id: Mapped[int] = mapped_column()
+
+    def __repr__(self) -> str:
+        return f"Watermark(key={self.key!r}, table_name={self.table_name!r}, updated_at={self.updated_at!r}, last_id={self.last_id!r})"